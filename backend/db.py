@@ -1,44 +1,133 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base
+from sqlalchemy import bindparam, event, func, inspect, select, text, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from models import Base, Question
+from utils import hash_question_text
+import orjson
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Database configuration
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./questions.db")
+# Async drivers only, e.g. sqlite+aiosqlite:// or postgresql+asyncpg://
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./questions.db")
 
-# Create engine
-engine = create_engine(
+# asyncpg keeps prepared statements per connection, so the repeated duplicate-check and
+# bulk-insert statements skip server-side parsing after their first use
+connect_args = {}
+if "asyncpg" in SQLALCHEMY_DATABASE_URL:
+    statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024"))
+    connect_args = {
+        "statement_cache_size": statement_cache_size,
+        "prepared_statement_cache_size": statement_cache_size
+    }
+
+# Create engine with an explicitly sized pool so concurrent requests reuse warm connections
+engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in SQLALCHEMY_DATABASE_URL else {}
+    connect_args=connect_args,
+    # JSON columns (fill-in-the-blank answers, match pairs) go through orjson instead of stdlib json
+    json_serializer=lambda value: orjson.dumps(value).decode(),
+    json_deserializer=orjson.loads,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "5")),
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    pool_pre_ping=True
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if "sqlite" in SQLALCHEMY_DATABASE_URL:
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets readers run alongside the writer; a 64MB page cache keeps hot pages in memory"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.close()
+
+# expire_on_commit=False so ORM attributes stay readable after commit without implicit async IO
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
-def create_tables():
+async def create_tables():
     """Create all database tables"""
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(backfill_question_text_hash)
+        await conn.run_sync(ensure_unique_question_hash)
+        await conn.run_sync(create_missing_indexes)
+
+def backfill_question_text_hash(conn):
+    """Add and populate questions.question_text_hash on databases created before the column existed"""
+    columns = {column["name"] for column in inspect(conn).get_columns("questions")}
+    if "question_text_hash" in columns:
+        return
+    
+    logger.info("Adding question_text_hash column to existing questions table...")
+    conn.execute(text("ALTER TABLE questions ADD COLUMN question_text_hash VARCHAR(64)"))
+    
+    rows = conn.execute(select(Question.id, Question.question_text)).all()
+    if rows:
+        conn.execute(
+            update(Question).where(Question.id == bindparam("row_id")),
+            [{"row_id": row.id, "question_text_hash": hash_question_text(row.question_text)} for row in rows]
+        )
+    
+    for index in Question.__table__.indexes:
+        if "question_text_hash" in index.columns and not index.unique:
+            index.create(conn, checkfirst=True)
+    logger.info("Backfilled question_text_hash for %d questions", len(rows))
 
-def get_db():
+def ensure_unique_question_hash(conn):
+    """Replace the old non-unique duplicate-check index with the UNIQUE one on existing databases"""
+    existing = {index["name"] for index in inspect(conn).get_indexes("questions")}
+    if "uq_questions_subject_type_hash" in existing:
+        return
+    
+    # Rows saved before the constraint may already collide; keep the hash on the oldest copy only
+    # (it still blocks new duplicates) and clear it on the rest so the UNIQUE index can be built
+    keep = (
+        select(func.min(Question.id))
+        .group_by(Question.subject, Question.question_type, Question.question_text_hash)
+        .scalar_subquery()
+    )
+    cleared = conn.execute(
+        update(Question)
+        .where(Question.question_text_hash.is_not(None), Question.id.not_in(keep))
+        .values(question_text_hash=None)
+    ).rowcount
+    if cleared:
+        logger.warning("Cleared question_text_hash on %d duplicate questions before adding UNIQUE index", cleared)
+    
+    if "ix_questions_subject_type_hash" in existing:
+        conn.execute(text("DROP INDEX ix_questions_subject_type_hash"))
+    for index in Question.__table__.indexes:
+        if index.unique:
+            index.create(conn, checkfirst=True)
+    logger.info("Created UNIQUE index on questions (subject, question_type, question_text_hash)")
+
+def create_missing_indexes(conn):
+    """create_all only indexes tables it creates, so add indexes introduced since the table was made"""
+    for index in Question.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+async def get_db():
     """Database dependency for FastAPI"""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Database utility functions
-def init_database():
+async def init_database():
     """Initialize database and create tables"""
     try:
-        create_tables()
+        await create_tables()
         logger.info("Database initialized successfully!")
     except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
+        logger.error("Database initialization failed: %s", e)
         raise
 
-def get_db_session():
-    """Get database session for direct use"""
+def get_db_session() -> AsyncSession:
+    """Get database session for direct use (use as `async with get_db_session() as db:`)"""
     return SessionLocal()
\ No newline at end of file
@@ -0,0 +1,38 @@
+from typing import Dict
+
+import numpy as np
+
+def calculate_rating_change_batch(question_ratings: np.ndarray, question_attempts: np.ndarray,
+                                  user_ratings: np.ndarray, user_attempts: np.ndarray,
+                                  is_correct: np.ndarray) -> Dict[str, np.ndarray]:
+    """Calculate rating changes for many answers at once; every argument is an array of the same length
+
+    Lives apart from utils so importing utils does not pull in NumPy
+    """
+    user_expected = 1.0 / (1.0 + np.power(10.0, (question_ratings - user_ratings) / 400.0))
+    question_expected = 1.0 - user_expected
+    
+    user_actual = np.where(is_correct, 1.0, 0.0)
+    question_actual = 1.0 - user_actual
+    
+    user_k = get_k_factor_batch(user_ratings, user_attempts)
+    question_k = get_k_factor_batch(question_ratings, question_attempts)
+    
+    # astype truncates toward zero like int() did in the scalar version
+    user_new_ratings = np.clip(user_ratings + (user_k * (user_actual - user_expected)).astype(np.int64), 800, 2400)
+    question_new_ratings = np.clip(question_ratings + (question_k * (question_actual - question_expected)).astype(np.int64), 800, 2400)
+    
+    return {
+        'user_expected': user_expected,
+        'question_expected': question_expected,
+        'user_new_rating': user_new_ratings,
+        'question_new_rating': question_new_ratings,
+        'user_change': user_new_ratings - user_ratings,
+        'question_change': question_new_ratings - question_ratings,
+        'user_k': user_k,
+        'question_k': question_k
+    }
+
+def get_k_factor_batch(ratings: np.ndarray, attempts_counts: np.ndarray) -> np.ndarray:
+    """utils.get_k_factor_example for arrays: the same branches as one np.select table, first match wins"""
+    return np.select([attempts_counts < 10, ratings < 1000, ratings > 2000], [40, 36, 24], default=32)
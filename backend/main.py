@@ -1,48 +1,61 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 import logging
+import os
 
-from db import init_database
-from routes import question_router
-
+# Load .env before importing modules that read configuration at import time
 load_dotenv()
 
+from db import engine, init_database
+from routes import question_router
+from services import close_ai_clients
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the application on startup and clean up on shutdown"""
+    try:
+        logger.info("Starting up the application...")
+        await init_database()
+    except Exception as e:
+        logger.error("Application startup failed: %s", e)
+        raise
+    
+    yield
+    
+    logger.info("Shutting down the application...")
+    logger.info("Database pool status: %s", engine.pool.status())
+    await engine.dispose()
+    await close_ai_clients()
+
 app = FastAPI(
     title="AI Question Generator API", 
     version="2.0.0",
-    description="A comprehensive quiz question generation API with AI and database integration"
+    description="A comprehensive quiz question generation API with AI and database integration",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Comma-separated list of exact origins, e.g. "https://quiz.example.com,http://localhost:5500"
+cors_origins = [origin.strip() for origin in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",") if origin.strip()]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=cors_origins,
+    allow_credentials="*" not in cors_origins,  # Credentials are not valid with a wildcard origin
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the application on startup"""
-    try:
-        logger.info("Starting up the application...")
-        init_database()
-    except Exception as e:
-        logger.error(f"Application startup failed: {e}")
-        raise
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Clean up on shutdown"""
-    logger.info("Shutting down the application...")
-
 # app.include_router(main_router)
 app.include_router(question_router)
 # app.include_router(meta_router)
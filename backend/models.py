@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -16,6 +16,7 @@ class Question(Base):
     topic = Column(String, index=True, nullable=False)
     sub_topic = Column(String, nullable=True)
     question_text = Column(Text, nullable=False)
+    question_text_hash = Column(String(64), index=True)  # sha256 of lowercased, stripped question_text
     explanation = Column(Text, nullable=True)
     elo_rating = Column(Integer, nullable=False)
     elo_min = Column(Integer, nullable=False)
@@ -24,11 +25,22 @@ class Question(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationships to specific question types
-    multiple_choice = relationship("MultipleChoiceQuestion", back_populates="question", uselist=False)
-    true_false = relationship("TrueFalseQuestion", back_populates="question", uselist=False)
-    fill_in_blanks = relationship("FillInBlanksQuestion", back_populates="question", uselist=False)
-    match_following = relationship("MatchFollowingQuestion", back_populates="question", uselist=False)
+    # Relationships to specific question types. They raise on lazy access: sessions are async,
+    # where a lazy load cannot run anyway, so every query has to choose its loader strategy
+    multiple_choice = relationship("MultipleChoiceQuestion", back_populates="question", uselist=False, lazy="raise")
+    true_false = relationship("TrueFalseQuestion", back_populates="question", uselist=False, lazy="raise")
+    fill_in_blanks = relationship("FillInBlanksQuestion", back_populates="question", uselist=False, lazy="raise")
+    match_following = relationship("MatchFollowingQuestion", back_populates="question", uselist=False, lazy="raise")
+
+    __table_args__ = (
+        # Covers the duplicate lookup: subject + question_type + question_text_hash equality probe.
+        # This stands in for a lower(question_text) expression index / CITEXT / COLLATE NOCASE column,
+        # and works the same on SQLite and PostgreSQL (EXPLAIN QUERY PLAN: SEARCH ... USING COVERING INDEX).
+        # UNIQUE so two requests racing to save the same question fail with IntegrityError instead of both inserting
+        Index("uq_questions_subject_type_hash", "subject", "question_type", "question_text_hash", unique=True),
+        # get_questions_from_db: equality filters, then newest-first by id, so LIMIT stops after `limit` index entries
+        Index("ix_questions_filter", "subject", "difficulty", "question_type", id.desc()),
+    )
 
 class MultipleChoiceQuestion(Base):
     """Multiple choice specific data"""
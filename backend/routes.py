@@ -1,75 +1,103 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from cachetools import TTLCache
+from contextlib import aclosing
+from typing import AsyncIterator, List, Set, Tuple
+from uuid import uuid4
+import asyncio
 import logging
+import orjson
 
-from db import get_db
+from db import get_db_session
 from schemas import (
-    QuestionRequest
+    QuestionRequest, GenerateQuestionsResponse, GenerationJobResponse, GenerationStats, JobStatus
+)
+from services import AIService, QuestionService, ai_batcher
+from utils import (
+    hash_question_text, find_existing_question_hashes, build_frontend_question
 )
-from services import QuestionService, AIService
-from utils import check_duplicate_question, create_question_response_from_dict, convert_to_frontend_format
 
 logger = logging.getLogger(__name__)
 
 question_router = APIRouter(prefix="/questions", tags=["questions"])
 
-@question_router.post("/generate")
-async def generate_questions(request: QuestionRequest, db: Session = Depends(get_db)):
+# job_id -> generation task, kept for an hour so clients can poll the result.
+# In-process only; move run_question_generation to a Celery/RQ worker with Redis results to scale out.
+_generation_jobs: TTLCache = TTLCache(maxsize=1_000, ttl=3600)
+# Strong references so running tasks are not garbage collected if their job entry expires
+_running_generation_tasks: Set[asyncio.Task] = set()
+
+@question_router.post("/generate", response_model=GenerateQuestionsResponse)
+async def generate_questions(request: QuestionRequest):
     """
     Generate questions using AI and save new ones to database.
     Always generates fresh questions, saves non-duplicates to DB.
     """
+    return await run_question_generation(request)
+
+@question_router.post("/generate/jobs", response_model=GenerationJobResponse, status_code=202)
+async def submit_generation_job(request: QuestionRequest):
+    """
+    Start question generation in the background and return a job id to poll,
+    so the request does not wait on the AI call.
+    """
+    job_id = uuid4().hex
+    task = asyncio.create_task(run_question_generation(request))
+    _running_generation_tasks.add(task)
+    task.add_done_callback(_running_generation_tasks.discard)
+    _generation_jobs[job_id] = task
+    
+    logger.info("Queued generation job %s", job_id)
+    return GenerationJobResponse(job_id=job_id, status=JobStatus.PENDING)
+
+@question_router.get("/generate/jobs/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(job_id: str):
+    """Get the status of a background generation job, with its result once completed"""
+    task = _generation_jobs.get(job_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    
+    if not task.done():
+        return GenerationJobResponse(job_id=job_id, status=JobStatus.PENDING)
     
-    logger.info(f"Starting question generation for {request.num_questions} {request.question_type.value} questions")
-    logger.info(f"Subject: {request.subject.value}, Difficulty: {request.difficulty.value}")
+    if task.cancelled():
+        return GenerationJobResponse(job_id=job_id, status=JobStatus.FAILED, error="Generation job was cancelled")
+    
+    error = task.exception()
+    if error is not None:
+        detail = error.detail if isinstance(error, HTTPException) else str(error)
+        return GenerationJobResponse(job_id=job_id, status=JobStatus.FAILED, error=detail)
+    
+    return GenerationJobResponse(job_id=job_id, status=JobStatus.COMPLETED, result=task.result())
+
+async def run_question_generation(request: QuestionRequest) -> dict:
+    """Generate questions with AI, save the non-duplicates and build the frontend response"""
+    
+    logger.info("Starting question generation for %d %s questions", request.num_questions, request.question_type.value)
+    logger.info("Subject: %s, Difficulty: %s", request.subject.value, request.difficulty.value)
     
     try:
         logger.info("Calling AI service to generate questions...")
-        question_dicts = await AIService.generate_questions_with_ai(request)
-        logger.info(f"AI generated {len(question_dicts)} question dictionaries")
+        # Concurrent requests arriving within the batch window share AI calls
+        question_dicts = await ai_batcher.submit(request)
+        logger.info("AI generated %d question dictionaries", len(question_dicts))
         
         if not question_dicts:
             raise HTTPException(status_code=500, detail="AI failed to generate any questions")
         
-        saved_questions = []
         frontend_questions = []
-        duplicates_found = 0
-        
         for i, question_data in enumerate(question_dicts):
             try:
-                logger.info(f"Processing question {i+1}/{len(question_dicts)}")
-                
-                is_duplicate = check_duplicate_question(
-                    db, 
-                    question_data['question_text'], 
-                    request.subject.value, 
-                    request.question_type.value
-                )
-                
-                if is_duplicate:
-                    duplicates_found += 1
-                    logger.info(f"Duplicate found, skipping save: {question_data['question_text'][:50]}...")
-                else:
-                    logger.info(f"Saving new question to database...")
-                    db_question = QuestionService.save_question_to_db(question_data, request, db)
-                    
-                    question_response = QuestionService.get_question_with_details(db, db_question.id)
-                    if question_response:
-                        saved_questions.append(question_response)
-                        logger.info(f"Successfully saved question {db_question.id}")
-      
-                temp_response = create_question_response_from_dict(question_data, request, i+1)
-                frontend_question = convert_to_frontend_format(temp_response)
-                frontend_questions.append(frontend_question)
-                
+                frontend_questions.append(build_frontend_question(question_data, request, i+1))
             except Exception as e:
-                logger.error(f"Error processing question {i+1}: {e}")
-                continue
+                logger.error("Error processing question %d: %s", i + 1, e)
         
-        logger.info(f"Summary: {len(saved_questions)} new questions saved, {duplicates_found} duplicates skipped")
+        saved_question_ids, duplicates_found = await save_new_questions(question_dicts, request)
+        logger.info("Summary: %d new questions saved, %d duplicates skipped", len(saved_question_ids), duplicates_found)
         
         if len(frontend_questions) < request.num_questions:
-            logger.warning(f"Only got {len(frontend_questions)} questions, requested {request.num_questions}")
+            logger.warning("Only got %d questions, requested %d", len(frontend_questions), request.num_questions)
         
         final_questions = frontend_questions[:request.num_questions]
         
@@ -85,20 +113,100 @@ async def generate_questions(request: QuestionRequest, db: Session = Depends(get
             "stats": {
                 "total_returned": len(final_questions),
                 "from_database": 0, 
-                "newly_generated": len(saved_questions),
+                "newly_generated": len(saved_question_ids),
                 "duplicates_skipped": duplicates_found
             }
         }
         
-        logger.info(f"SUCCESS! Returning {len(final_questions)} questions to frontend")
-        logger.info(f"Stats: {response_data['stats']}")
+        logger.info("SUCCESS! Returning %d questions to frontend", len(final_questions))
+        logger.info("Stats: %s", response_data['stats'])
         
         return response_data
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"CRITICAL ERROR in generate_questions: {e}")
+        logger.error("CRITICAL ERROR in generate_questions: %s", e)
         import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
\ No newline at end of file
+        logger.error("Traceback: %s", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to generate questions: {str(e)}")
+
+async def save_new_questions(question_dicts: List[dict], request: QuestionRequest) -> Tuple[List[int], int]:
+    """Save the questions that are not already stored; returns (saved question ids, duplicates skipped)"""
+    new_questions = []
+    duplicates_found = 0
+    
+    question_hashes = [hash_question_text(q['question_text']) for q in question_dicts]
+    
+    # The AI call runs without a pooled connection; only this DB phase holds one
+    async with get_db_session() as db:
+        existing_hashes = await find_existing_question_hashes(
+            db,
+            question_hashes,
+            request.subject.value,
+            request.question_type.value
+        )
+        
+        for i, question_data in enumerate(question_dicts):
+            logger.debug("Processing question %d/%d", i + 1, len(question_dicts))
+            
+            question_hash = question_hashes[i]
+            if question_hash in existing_hashes:
+                duplicates_found += 1
+                logger.debug("Duplicate found, skipping save: %.50s...", question_data['question_text'])
+            else:
+                new_questions.append(question_data)
+                existing_hashes.add(question_hash)
+        
+        saved_question_ids = []
+        if new_questions:
+            try:
+                logger.info("Saving %d new questions to database...", len(new_questions))
+                saved_question_ids = await QuestionService.save_questions_batch(new_questions, request, db)
+                logger.info("Successfully saved questions %s", saved_question_ids)
+            except IntegrityError:
+                # Raced another request on one of these questions; they are still returned, just not saved twice
+                logger.warning("Skipped saving %d questions: a duplicate was saved concurrently", len(new_questions))
+            except Exception as e:
+                logger.error("Error saving new questions: %s", e)
+    
+    return saved_question_ids, duplicates_found
+
+@question_router.post("/generate/stream")
+async def stream_generated_questions(request: QuestionRequest):
+    """
+    Generate questions with AI and send each one as a server-sent "question" event as soon as it is parsed.
+    New questions are saved once the AI finishes; a final "done" event carries the stats.
+    """
+    return StreamingResponse(_question_events(request), media_type="text/event-stream")
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+async def _question_events(request: QuestionRequest) -> AsyncIterator[str]:
+    question_dicts = []
+    try:
+        async with aclosing(AIService.stream_questions(request)) as questions:
+            async for question_data in questions:
+                question_dicts.append(question_data)
+                question = build_frontend_question(question_data, request, len(question_dicts))
+                yield _sse("question", question.model_dump(mode="json"))
+                if len(question_dicts) == request.num_questions:
+                    break
+    except Exception as e:
+        logger.error("Error streaming questions: %s", e)
+        yield _sse("error", {"detail": f"Failed to generate questions: {str(e)}"})
+        return
+    
+    if not question_dicts:
+        yield _sse("error", {"detail": "No questions could be generated"})
+        return
+    
+    saved_question_ids, duplicates_found = await save_new_questions(question_dicts, request)
+    logger.info("Streamed %d questions, %d new saved, %d duplicates skipped", len(question_dicts), len(saved_question_ids), duplicates_found)
+    yield _sse("done", GenerationStats(
+        total_returned=len(question_dicts),
+        from_database=0,
+        newly_generated=len(saved_question_ids),
+        duplicates_skipped=duplicates_found
+    ).model_dump())
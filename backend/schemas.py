@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from enum import Enum
 
@@ -29,13 +29,20 @@ class State(str, Enum):
     EDUCATIONAL = "educational"
     COMPETITIVE = "competitive"
 
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 # Request schema
 class QuestionRequest(BaseModel):
     subject: Subject
     difficulty: DifficultyLevel = DifficultyLevel.MEDIUM
     question_type: QuestionType = QuestionType.MULTIPLE_CHOICE
-    num_questions: int = 5
-    topic: Optional[str] = None
+    # Bounded: large requests fan out into one billed AI call per AI_CHUNK_SIZE questions
+    num_questions: int = Field(5, ge=1, le=50)
+    # Pasted into AI prompts (batched ones shared with other users' requests), so kept to one short line
+    topic: Optional[str] = Field(None, max_length=100, pattern=r"^[^\r\n]*$")
     sub_topic: Optional[str] = None
     state: State = State.FUN
 
@@ -80,6 +87,41 @@ class QuestionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Frontend response schemas
+class FrontendQuestion(BaseModel):
+    id: Optional[int] = None
+    topic: str
+    sub_topic: Optional[str] = None
+    question: str
+    explanation: Optional[str] = None
+    elo_rating: int
+    elo_range: List[int]
+    state: str
+    options: Optional[List[str]] = None
+    correct_answer: str = ""
+    blanks: Optional[List[str]] = None
+    match_pairs: Optional[Dict[str, str]] = None
+
+class GenerationStats(BaseModel):
+    total_returned: int
+    from_database: int
+    newly_generated: int
+    duplicates_skipped: int
+
+class GenerateQuestionsResponse(BaseModel):
+    subject: str
+    difficulty: str
+    question_type: str
+    questions: List[FrontendQuestion]
+    source: str
+    stats: GenerationStats
+
+class GenerationJobResponse(BaseModel):
+    job_id: str
+    status: JobStatus
+    result: Optional[GenerateQuestionsResponse] = None
+    error: Optional[str] = None
+
 # Other response schemas
 class MessageResponse(BaseModel):
     message: str
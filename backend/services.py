@@ -1,7 +1,21 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from openai import AsyncOpenAI
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from cachetools import TTLCache
+from redis import asyncio as aioredis
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+import asyncio
+import functools
+import hashlib
+import httpx
+import orjson
 import os
+import re
 import logging
 
 from models import (
@@ -12,119 +26,338 @@ from schemas import (
     QuestionRequest, QuestionResponse, QuestionType, State,
     MultipleChoiceData, TrueFalseData, FillInBlanksData, MatchFollowingData
 )
+from utils import hash_question_text, mark_questions_saved, forget_question
 
 # fun, new,
 logger = logging.getLogger(__name__)
 
+# Caps in-flight OpenRouter calls across all requests in this process
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "20"))
+_OPENAI_SEM = asyncio.Semaphore(OPENAI_CONCURRENCY)
+
 # Initialize OpenAI client
 openai_key = os.getenv("OPENAI_API_KEY")
+# Shared HTTP/2 pool so concurrent calls multiplex over warm connections instead of
+# opening (and TLS-handshaking) new ones; never smaller than the concurrency cap.
+# The read timeout has to cover a full non-streamed completion of up to 16k tokens.
+_openrouter_http = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(
+        max_connections=max(100, OPENAI_CONCURRENCY),
+        max_keepalive_connections=max(50, OPENAI_CONCURRENCY)
+    ),
+    timeout=httpx.Timeout(float(os.getenv("AI_HTTP_TIMEOUT", "120")), connect=5.0)
+) if openai_key else None
+# SDK retries are off: they would sleep while holding _OPENAI_SEM and multiply with tenacity's attempts
 openrouter = AsyncOpenAI(
     base_url="https://openrouter.ai/api/v1", 
-    api_key=openai_key
+    api_key=openai_key,
+    http_client=_openrouter_http,
+    max_retries=0
 ) if openai_key else None
 
+# The Batch API (files + batches) is OpenAI-only, so bulk seeding talks to api.openai.com directly.
+# Its few, unthrottled calls are not wrapped in tenacity, so the SDK's own retries stay the only layer there.
+openai_batch_key = os.getenv("OPENAI_BATCH_API_KEY")
+openai_batch = AsyncOpenAI(api_key=openai_batch_key) if openai_batch_key else None
+
+SYSTEM_PROMPT = "You are an expert educational content creator. You must follow the exact format specified."
+
+# Optional Redis cache for AI responses. Identical prompts then return the same questions,
+# so enable it (REDIS_URL) for dev/test loops or when repeat generations are acceptable.
+redis_url = os.getenv("REDIS_URL")
+redis_client = aioredis.from_url(redis_url) if redis_url else None
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "86400"))
+
+# Requests for more questions than this are split into chunks generated concurrently
+AI_CHUNK_SIZE = int(os.getenv("AI_CHUNK_SIZE", "5"))
+# Each chunk of a split request is steered to a different angle so concurrent calls do not return the same questions
+_CHUNK_FOCUSES = (
+    "core definitions and concepts",
+    "real-world applications",
+    "problem solving and reasoning",
+    "history and key discoveries",
+    "common misconceptions",
+    "comparisons and relationships between ideas",
+    "specific examples and edge cases",
+    "cause and effect",
+)
+
+# Short-lived read caches; writes through QuestionService invalidate them.
+# Per-process only - use a shared cache (e.g. Redis) when running several workers.
+_question_details_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+_question_list_cache: TTLCache = TTLCache(maxsize=1_000, ttl=60)
+
+# "TASK 3:" header lines that open each task's section in a batched AI response. The AI often
+# echoes the task description after the colon or wraps the header in markdown ("**TASK 3:**", "### TASK 3:")
+_TASK_HEADER_RE = re.compile(r"^[ \t]*[#*]*[ \t]*TASK[ \t]+(\d+)[ \t]*:.*$", re.IGNORECASE | re.MULTILINE)
+# Batched completions get 400 tokens per question, capped at 16k. Every request in a shared call waits
+# for the whole completion, so groups are also kept to about two chunks' worth of output.
+_MAX_BATCHED_QUESTIONS = min(16000 // 400, int(os.getenv("AI_BATCH_MAX_QUESTIONS", str(2 * AI_CHUNK_SIZE))))
+
+# QuestionType -> "multiple choice" etc. as written in prompts
+_QUESTION_TYPE_NAMES = {question_type: question_type.value.replace("_", " ") for question_type in QuestionType}
+
+# Separator lines between question blocks: "---", or any longer run of dashes, on a line of its own
+_BLOCK_RE = re.compile(r"^[ \t]*-{3,}[ \t]*$", re.MULTILINE)
+
+# "TAG: value" lines in a question block; one match classifies the line and extracts its value
+_LINE_RE = re.compile(r"^(TOPIC|SUBTOPIC|QUESTION|EXPLANATION|RATING|ANSWER|BLANKS|PAIRS)\s*:\s*(.*)$", re.IGNORECASE)
+# "A) option" lines of a multiple choice question
+_OPT_RE = re.compile(r"^([A-D])\)\s*(.*)$")
+
+# Transient OpenRouter failures worth another attempt: 429s, 5xx and timeouts or dropped connections
+_RETRYABLE_AI_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+# Dialects whose insert() supports ON CONFLICT DO NOTHING against the duplicate-check UNIQUE index
+_CONFLICT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+# question_type -> the one relationship _convert_db_to_response reads for that type
+_TYPE_SPECIFIC_RELATIONSHIPS = {
+    QuestionType.MULTIPLE_CHOICE.value: Question.multiple_choice,
+    QuestionType.TRUE_FALSE.value: Question.true_false,
+    QuestionType.FILL_IN_THE_BLANKS.value: Question.fill_in_blanks,
+    QuestionType.MATCH_THE_FOLLOWING.value: Question.match_following,
+}
+
+async def close_ai_clients() -> None:
+    """Close the pooled AI HTTP connections; called on application shutdown"""
+    if openrouter:
+        await openrouter.close()
+    if openai_batch:
+        await openai_batch.close()
+
+def _ai_cache_key(kind: str, *parts) -> str:
+    return f"openrouter:{kind}:" + hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()
+
+async def _ai_cache_get_many(keys: Sequence[str]) -> List[Optional[bytes]]:
+    """Fetch cached AI values in one round trip; a cache outage behaves like misses"""
+    if not redis_client or not keys:
+        return [None] * len(keys)
+    try:
+        return await redis_client.mget(keys)
+    except Exception as e:
+        logger.warning("AI cache read failed: %s", e)
+        return [None] * len(keys)
+
+async def _ai_cache_set(key: str, value: bytes) -> None:
+    if not redis_client:
+        return
+    try:
+        await redis_client.set(key, value, ex=AI_CACHE_TTL)
+    except Exception as e:
+        logger.warning("AI cache write failed: %s", e)
+
 class QuestionService:
     """Service class for question-related operations with normalized schema"""
     
     @staticmethod
-    def save_question_to_db(question_data: dict, request: QuestionRequest, db: Session) -> Question:
-        """Save a question to the normalized database structure"""
+    async def save_question_to_db(question_data: dict, request: QuestionRequest, db: AsyncSession, commit: bool = True) -> Optional[Question]:
+        """Save a question to the normalized database structure (single-row save_questions_batch); None if it already exists"""
+        question_ids = await QuestionService.save_questions_batch([question_data], request, db, commit=commit)
+        return await db.get(Question, question_ids[0]) if question_ids else None
+
+    @staticmethod
+    def mark_questions_committed(questions_data: List[dict], request: QuestionRequest, question_ids: List[int]) -> None:
+        """Update the duplicate and read caches once a save_questions_batch transaction has committed"""
+        mark_questions_saved(
+            request.subject.value,
+            request.question_type.value,
+            [hash_question_text(question_data['question_text']) for question_data in questions_data]
+        )
+        for question_id in question_ids:
+            _question_details_cache.pop(question_id, None)
+        _question_list_cache.clear()
+    
+    @staticmethod
+    async def save_questions_batch(questions_data: List[dict], request: QuestionRequest, db: AsyncSession, commit: bool = True) -> List[int]:
+        """
+        Bulk insert questions and their type-specific rows, committing once for the whole batch.
+        With commit=False the inserts join the caller's transaction (any failure here rolls it all back);
+        after committing, the caller must call mark_questions_committed so the caches see the new rows.
+        """
+        if not questions_data:
+            return []
+        
         try:
-            # Create main question record
-            question = Question(
-                subject=request.subject.value,
-                difficulty=request.difficulty.value,
-                question_type=request.question_type.value,
-                topic=question_data['topic'],
-                sub_topic=question_data.get('sub_topic'),
-                question_text=question_data['question_text'],
-                explanation=question_data.get('explanation'),
-                elo_rating=question_data['elo_rating'],
-                elo_min=question_data['elo_range'][0],
-                elo_max=question_data['elo_range'][1],
-                state=request.state.value
-            )
+            parent_rows = [
+                {
+                    "subject": request.subject.value,
+                    "difficulty": request.difficulty.value,
+                    "question_type": request.question_type.value,
+                    "topic": question_data['topic'],
+                    "sub_topic": question_data.get('sub_topic'),
+                    "question_text": question_data['question_text'],
+                    "question_text_hash": hash_question_text(question_data['question_text']),
+                    "explanation": question_data.get('explanation'),
+                    "elo_rating": question_data['elo_rating'],
+                    "elo_min": question_data['elo_range'][0],
+                    "elo_max": question_data['elo_range'][1],
+                    "state": request.state.value
+                }
+                for question_data in questions_data
+            ]
+            dialect_insert = _CONFLICT_INSERTS.get(db.get_bind().dialect.name)
+            if dialect_insert is not None:
+                # Rows another request saved after our duplicate check are skipped, not fatal to the batch
+                statement = dialect_insert(Question).on_conflict_do_nothing(
+                    index_elements=["subject", "question_type", "question_text_hash"]
+                )
+            else:
+                statement = insert(Question)
+            inserted = (await db.execute(
+                statement.returning(Question.id, Question.question_text_hash),
+                parent_rows
+            )).all()
             
-            db.add(question)
-            db.flush()  # Get the question ID
+            # Match ids back by hash: skipped rows return nothing, and an in-batch repeat keeps only its first copy
+            id_by_hash = {question_hash: question_id for question_id, question_hash in inserted}
+            saved = [
+                (id_by_hash.pop(row["question_text_hash"]), question_data)
+                for row, question_data in zip(parent_rows, questions_data)
+                if row["question_text_hash"] in id_by_hash
+            ]
+            if len(saved) < len(parent_rows):
+                logger.warning("Skipped %d questions already saved by another request or repeated in the batch", len(parent_rows) - len(saved))
+            question_ids = [question_id for question_id, _ in saved]
             
-            # Create type-specific record
+            # Create type-specific records
             if request.question_type == QuestionType.MULTIPLE_CHOICE:
-                mc_question = MultipleChoiceQuestion(
-                    question_id=question.id,
-                    option_a=question_data['options'][0][3:],  # Remove "A) " prefix
-                    option_b=question_data['options'][1][3:],  # Remove "B) " prefix
-                    option_c=question_data['options'][2][3:],  # Remove "C) " prefix
-                    option_d=question_data['options'][3][3:],  # Remove "D) " prefix
-                    correct_option=question_data['correct_answer']
-                )
-                db.add(mc_question)
+                child_model = MultipleChoiceQuestion
+                child_rows = [
+                    {
+                        "question_id": question_id,
+                        # Options arrive from the parser with their "A) " labels already stripped
+                        "option_a": question_data['options'][0],
+                        "option_b": question_data['options'][1],
+                        "option_c": question_data['options'][2],
+                        "option_d": question_data['options'][3],
+                        "correct_option": question_data['correct_answer']
+                    }
+                    for question_id, question_data in saved
+                ]
             
             elif request.question_type == QuestionType.TRUE_FALSE:
-                tf_question = TrueFalseQuestion(
-                    question_id=question.id,
-                    correct_answer=question_data['correct_answer']
-                )
-                db.add(tf_question)
+                child_model = TrueFalseQuestion
+                child_rows = [
+                    {"question_id": question_id, "correct_answer": question_data['correct_answer']}
+                    for question_id, question_data in saved
+                ]
             
             elif request.question_type == QuestionType.FILL_IN_THE_BLANKS:
-                fib_question = FillInBlanksQuestion(
-                    question_id=question.id,
-                    answers=question_data['blanks']
-                )
-                db.add(fib_question)
+                child_model = FillInBlanksQuestion
+                child_rows = [
+                    {"question_id": question_id, "answers": question_data['blanks']}
+                    for question_id, question_data in saved
+                ]
             
-            elif request.question_type == QuestionType.MATCH_THE_FOLLOWING:
-                match_question = MatchFollowingQuestion(
-                    question_id=question.id,
-                    pairs=question_data['match_pairs']
-                )
-                db.add(match_question)
+            else:
+                child_model = MatchFollowingQuestion
+                child_rows = [
+                    {"question_id": question_id, "pairs": question_data['match_pairs']}
+                    for question_id, question_data in saved
+                ]
             
-            db.commit()
-            db.refresh(question)
-            logger.info(f"Successfully saved question {question.id} to normalized database")
-            return question
+            if child_rows:
+                await db.execute(insert(child_model), child_rows)
+            if commit:
+                await db.commit()
+                QuestionService.mark_questions_committed(questions_data, request, question_ids)
+                logger.info("Successfully saved %d questions to normalized database", len(question_ids))
+            else:
+                # Not committed yet: the caches are left alone so a later rollback cannot leave them stale
+                logger.info("Inserted %d questions, waiting for the caller to commit", len(question_ids))
+            return list(question_ids)
             
+        except IntegrityError as e:
+            # Dialects without ON CONFLICT support: another request saved one of these questions after
+            # our duplicate check; drop the cached "not a duplicate" answers so the next check hits the database
+            logger.warning("Duplicate question saved concurrently, batch not saved: %s", e.orig)
+            await db.rollback()
+            for row in parent_rows:
+                forget_question(row["subject"], row["question_type"], row["question_text_hash"])
+            raise
         except Exception as e:
-            logger.error(f"Error saving question to database: {e}")
-            db.rollback()
+            logger.error("Error saving questions to database: %s", e)
+            await db.rollback()
             raise
 
     @staticmethod
-    def get_question_with_details(db: Session, question_id: int) -> Optional[QuestionResponse]:
+    async def get_question_with_details(db: AsyncSession, question_id: int) -> Optional[QuestionResponse]:
         """Get a question with its type-specific details"""
-        question = db.query(Question).filter(Question.id == question_id).first()
+        cached = _question_details_cache.get(question_id)
+        if cached is not None:
+            return cached
+        
+        # Single row: one JOINed SELECT loads whichever type-specific row exists
+        question = (await db.execute(
+            select(Question)
+            .options(
+                joinedload(Question.multiple_choice),
+                joinedload(Question.true_false),
+                joinedload(Question.fill_in_blanks),
+                joinedload(Question.match_following),
+                raiseload("*")
+            )
+            .where(Question.id == question_id)
+        )).scalar_one_or_none()
         if not question:
             return None
         
-        return QuestionService._convert_db_to_response(question)
+        response = QuestionService._convert_db_to_response(question)
+        _question_details_cache[question_id] = response
+        return response
 
     @staticmethod
-    def get_questions_from_db(
-        db: Session,
+    async def get_questions_from_db(
+        db: AsyncSession,
         subject: Optional[str] = None,
         difficulty: Optional[str] = None,
         question_type: Optional[str] = None,
-        limit: int = 10
+        limit: int = 10,
+        before_id: Optional[int] = None
     ) -> List[QuestionResponse]:
-        """Retrieve questions from normalized database with optional filters"""
+        """
+        Retrieve questions from normalized database with optional filters, newest first.
+        Pass the last id of a page as before_id to get the next page (keyset pagination).
+        """
+        cache_key = (subject, difficulty, question_type, limit, before_id)
+        cached = _question_list_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            query = db.query(Question)
+            type_relationship = _TYPE_SPECIFIC_RELATIONSHIPS.get(question_type)
+            if type_relationship is not None:
+                # Only one type table can match, so JOIN it in and fetch everything in one SELECT
+                query = select(Question).options(joinedload(type_relationship), raiseload("*"))
+            else:
+                # Mixed types: one extra SELECT ... WHERE question_id IN (...) per type table
+                query = select(Question).options(
+                    selectinload(Question.multiple_choice),
+                    selectinload(Question.true_false),
+                    selectinload(Question.fill_in_blanks),
+                    selectinload(Question.match_following),
+                    raiseload("*")
+                )
             
             if subject:
-                query = query.filter(Question.subject == subject)
+                query = query.where(Question.subject == subject)
             if difficulty:
-                query = query.filter(Question.difficulty == difficulty)
+                query = query.where(Question.difficulty == difficulty)
             if question_type:
-                query = query.filter(Question.question_type == question_type)
+                query = query.where(Question.question_type == question_type)
+            if before_id is not None:
+                query = query.where(Question.id < before_id)
             
-            questions = query.limit(limit).all()
-            logger.info(f"Retrieved {len(questions)} questions from database")
+            questions = (await db.scalars(query.order_by(Question.id.desc()).limit(limit))).all()
+            logger.info("Retrieved %d questions from database", len(questions))
             
-            return [QuestionService._convert_db_to_response(q) for q in questions]
+            responses = [QuestionService._convert_db_to_response(q) for q in questions]
+            _question_list_cache[cache_key] = responses
+            return responses
         except Exception as e:
-            logger.error(f"Error retrieving questions: {e}")
+            logger.error("Error retrieving questions: %s", e)
             raise
 
     @staticmethod
@@ -175,15 +408,18 @@ class QuestionService:
         return response
 
     @staticmethod
-    def delete_question_by_id(db: Session, question_id: int) -> bool:
+    async def delete_question_by_id(db: AsyncSession, question_id: int) -> bool:
         """Delete a question and its type-specific data"""
-        question = db.query(Question).filter(Question.id == question_id).first()
+        question = await db.get(Question, question_id)
         if not question:
             return False
         
         # SQLAlchemy will handle cascade deletes
-        db.delete(question)
-        db.commit()
+        await db.delete(question)
+        await db.commit()
+        forget_question(question.subject, question.question_type, question.question_text_hash)
+        _question_details_cache.pop(question_id, None)
+        _question_list_cache.clear()
         return True
 
 class AIService:
@@ -195,18 +431,63 @@ class AIService:
         if not openrouter:
             raise Exception("AI service not configured - OpenAI API key missing")
         
-        prompt = AIService._create_ai_prompt(request)
-        logger.info("Created AI prompt successfully")
+        chunk_requests = AIService._split_request(request)
+        if len(chunk_requests) == 1:
+            prompts = [AIService._create_ai_prompt(request)]
+        else:
+            prompts = [
+                AIService._create_ai_prompt(chunk_request) + AIService._chunk_instructions(chunk_index, request.num_questions)
+                for chunk_index, chunk_request in enumerate(chunk_requests)
+            ]
+        logger.info("Created %d AI prompt(s) successfully", len(prompts))
+        
+        # Parsed questions are cached per chunk, so a hit skips both the AI call and parsing
+        parsed_keys = [
+            _ai_cache_key(
+                # Bump the version whenever the parsed question dict changes shape
+                "parsed-v2", variant, prompt,
+                chunk_request.question_type.value, chunk_request.subject.value,
+                chunk_request.sub_topic, chunk_request.state.value
+            )
+            for variant, (prompt, chunk_request) in enumerate(zip(prompts, chunk_requests))
+        ]
+        chunk_questions: List[Optional[List[dict]]] = [
+            orjson.loads(cached) if cached else None
+            for cached in await _ai_cache_get_many(parsed_keys)
+        ]
+        pending = [i for i, cached in enumerate(chunk_questions) if cached is None]
         
-        ai_response = await AIService._call_openrouter(prompt)
-        if not ai_response:
-            raise Exception("AI service failed to generate response")
+        if pending:
+            ai_responses = await AIService._call_many([prompts[i] for i in pending], variants=pending)
+            if len(pending) == len(prompts) and not any(
+                ai_response and not isinstance(ai_response, Exception) for ai_response in ai_responses
+            ):
+                raise Exception("AI service failed to generate response")
+            
+            for i, ai_response in zip(pending, ai_responses):
+                chunk_questions[i] = []
+                if not ai_response or isinstance(ai_response, Exception):
+                    logger.error("AI chunk of %d questions failed: %s", chunk_requests[i].num_questions, ai_response)
+                    continue
+                
+                logger.info("AI response received: %d characters", len(ai_response))
+                logger.debug("AI response preview: %.500s...", ai_response)
+                
+                chunk_questions[i] = AIService._parse_ai_response(ai_response, chunk_requests[i])
+                if chunk_questions[i]:
+                    await _ai_cache_set(parsed_keys[i], orjson.dumps(chunk_questions[i]))
         
-        logger.info(f"AI response received: {len(ai_response)} characters")
-        logger.info(f"AI response preview: {ai_response[:500]}...")
+        questions = []
+        seen_hashes = set()
+        for parsed_questions in chunk_questions:
+            # Chunks are steered apart but can still overlap, so drop repeats across them
+            for question in parsed_questions:
+                question_hash = hash_question_text(question['question_text'])
+                if question_hash not in seen_hashes:
+                    seen_hashes.add(question_hash)
+                    questions.append(question)
         
-        questions = AIService._parse_ai_response(ai_response, request)
-        logger.info(f"Parsed {len(questions)} questions from AI response")
+        logger.info("Parsed %d questions from AI response", len(questions))
         
         if not questions:
             raise Exception("Failed to parse AI response into valid questions")
@@ -214,29 +495,310 @@ class AIService:
         return questions
 
     @staticmethod
-    async def _call_openrouter(prompt: str) -> str:
-        """Call OpenRouter API"""
+    def _split_request(request: QuestionRequest) -> List[QuestionRequest]:
+        """Split a request into chunks of at most AI_CHUNK_SIZE questions"""
+        if request.num_questions <= AI_CHUNK_SIZE:
+            return [request]
+        
+        return [
+            request.model_copy(update={"num_questions": min(AI_CHUNK_SIZE, request.num_questions - start)})
+            for start in range(0, request.num_questions, AI_CHUNK_SIZE)
+        ]
+
+    @staticmethod
+    def _chunk_instructions(chunk_index: int, total_questions: int) -> str:
+        """Extra prompt lines telling one chunk of a split request which part of the set it writes"""
+        start = chunk_index * AI_CHUNK_SIZE
+        end = min(start + AI_CHUNK_SIZE, total_questions)
+        focus = _CHUNK_FOCUSES[chunk_index % len(_CHUNK_FOCUSES)]
+        return (
+            f"\nThese are questions {start + 1}-{end} of {total_questions}, written in parallel with the rest of the set.\n"
+            f"- Focus on {focus} so they do not repeat the other parts (set part {chunk_index + 1})\n"
+        )
+
+    @staticmethod
+    async def _call_many(prompts: List[str], variants: Optional[List[int]] = None) -> List[Optional[str]]:
+        """Call OpenRouter for every prompt concurrently, bounded by OPENAI_CONCURRENCY"""
+        variants = variants if variants is not None else [0] * len(prompts)
+        return await asyncio.gather(
+            *[AIService._call_openrouter(prompt, variant=variant) for prompt, variant in zip(prompts, variants)],
+            return_exceptions=True
+        )
+
+    @staticmethod
+    async def generate_questions_batched(requests: List[QuestionRequest]) -> List[List[dict]]:
+        """
+        Generate questions for several requests with one AI call per (question_type, difficulty) group.
+        Returns one list of question dicts per request, in order; a request whose task failed gets [].
+        """
+        if not openrouter:
+            raise Exception("AI service not configured - OpenAI API key missing")
+        
+        # Requests sharing type and difficulty can share the format example and instructions.
+        # Requests big enough to be chunked go on their own, and each shared call is kept within
+        # _MAX_BATCHED_QUESTIONS so its completion fits the token cap and stays quick.
+        groups: List[List[int]] = []
+        open_groups: Dict[Tuple[QuestionType, str], Tuple[List[int], int]] = {}
+        for i, request in enumerate(requests):
+            if request.num_questions > AI_CHUNK_SIZE:
+                groups.append([i])
+                continue
+            key = (request.question_type, request.difficulty.value)
+            indexes, total = open_groups.get(key, (None, 0))
+            if indexes is None or total + request.num_questions > _MAX_BATCHED_QUESTIONS:
+                indexes, total = [], 0
+                groups.append(indexes)
+            indexes.append(i)
+            open_groups[key] = (indexes, total + request.num_questions)
+        
+        results: List[List[dict]] = [[] for _ in requests]
+        
+        async def run_single(i: int) -> None:
+            try:
+                results[i] = await AIService.generate_questions_with_ai(requests[i])
+            except Exception as e:
+                logger.error("Generation failed for request %d of the batch: %s", i + 1, e)
+        
+        async def run_group(indexes: List[int]) -> None:
+            if len(indexes) == 1:
+                await run_single(indexes[0])
+                return
+            
+            group_requests = [requests[i] for i in indexes]
+            prompt = AIService._create_batched_ai_prompt(group_requests)
+            total_questions = sum(request.num_questions for request in group_requests)
+            ai_response = await AIService._call_openrouter(prompt, max_tokens=min(16000, 400 * total_questions))
+            
+            sections = AIService._split_task_sections(ai_response) if ai_response else {}
+            retry_indexes = []
+            for task_number, (i, request) in enumerate(zip(indexes, group_requests), 1):
+                if task_number in sections:
+                    results[i] = AIService._parse_ai_response(sections[task_number], request)
+                if not results[i]:
+                    retry_indexes.append(i)
+            
+            # A missing or unparseable task falls back to its own call rather than failing the request
+            if retry_indexes:
+                logger.warning("Batched AI call left %d of %d tasks without questions; generating them individually",
+                               len(retry_indexes), len(indexes))
+                await asyncio.gather(*[run_single(i) for i in retry_indexes])
+        
+        await asyncio.gather(*[run_group(indexes) for indexes in groups])
+        return results
+
+    @staticmethod
+    async def submit_bulk_generation(requests: List[QuestionRequest]) -> str:
+        """
+        Submit non-interactive bulk generation (e.g. seeding the question bank) to the OpenAI Batch API.
+        Batches cost half as much and use a separate rate-limit pool, completing within 24 hours.
+        Returns the batch id to pass to await_batch.
+        """
+        if not openai_batch:
+            raise Exception("Batch API not configured - OPENAI_BATCH_API_KEY missing")
+        
+        lines = [
+            orjson.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": "gpt-4o-mini",
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": AIService._create_ai_prompt(request)}
+                    ],
+                    "temperature": 0.7,
+                    "max_tokens": min(16000, max(2000, 400 * request.num_questions))
+                }
+            })
+            for i, request in enumerate(requests)
+        ]
+        
+        batch_file = await openai_batch.files.create(file=("questions.jsonl", b"\n".join(lines)), purpose="batch")
+        batch = await openai_batch.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("Submitted batch %s with %d generation requests", batch.id, len(requests))
+        return batch.id
+
+    @staticmethod
+    async def await_batch(batch_id: str, requests: List[QuestionRequest], poll_seconds: float = 60) -> List[List[dict]]:
+        """
+        Poll a batch from submit_bulk_generation until it finishes and parse its output.
+        `requests` must be the list that was submitted; returns one list of question dicts per request.
+        """
+        if not openai_batch:
+            raise Exception("Batch API not configured - OPENAI_BATCH_API_KEY missing")
+        
+        while True:
+            batch = await openai_batch.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise Exception(f"Batch {batch_id} ended with status {batch.status}")
+            logger.info("Batch %s is %s, checking again in %ss", batch_id, batch.status, poll_seconds)
+            await asyncio.sleep(poll_seconds)
+        
+        results: List[List[dict]] = [[] for _ in requests]
+        if not batch.output_file_id and not batch.error_file_id:
+            logger.error("Batch %s completed without an output or error file", batch_id)
+            return results
+        
+        # Successful requests land in the output file, failed ones in the error file; both use the same line format
+        failed = 0
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await openai_batch.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                i = int(record["custom_id"])
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or not body.get("choices"):
+                    failed += 1
+                    logger.error("Batch %s request %d failed (status %s): %s", batch_id, i,
+                                 response.get("status_code"), record.get("error") or body.get("error"))
+                    continue
+                results[i] = AIService._parse_ai_response(body["choices"][0]["message"]["content"], requests[i])
+        
+        logger.info("Batch %s produced %d questions, %d of %d requests failed",
+                    batch_id, sum(len(r) for r in results), failed, len(requests))
+        return results
+
+    @staticmethod
+    def _split_task_sections(ai_response: str) -> Dict[int, str]:
+        """Split a batched AI response into {task number: section text} on its TASK headers"""
+        parts = _TASK_HEADER_RE.split(ai_response)
+        # parts = [preamble, number, section, number, section, ...]
+        return {int(number): section for number, section in zip(parts[1::2], parts[2::2])}
+
+    @staticmethod
+    async def _call_openrouter(prompt: str, max_tokens: int = 2000, variant: int = 0, cache: bool = True) -> str:
+        """Call OpenRouter API, serving repeats of the same prompt and variant from the Redis cache"""
         try:
+            cache_key = _ai_cache_key("response", variant, max_tokens, prompt)
+            if cache:
+                cached = (await _ai_cache_get_many([cache_key]))[0]
+                if cached:
+                    logger.info("OpenRouter response served from cache")
+                    return cached.decode()
+            
             logger.info("Calling OpenRouter API...")
             
+            response_text = await AIService._create_completion(prompt, max_tokens)
+            logger.info("OpenRouter response length: %d", len(response_text))
+            
+            if cache and response_text:
+                await _ai_cache_set(cache_key, response_text.encode())
+            
+            return response_text
+            
+        except Exception as e:
+            logger.error("OpenRouter failed: %s", e)
+            return None
+
+    @staticmethod
+    @retry(
+        retry=retry_if_exception_type(_RETRYABLE_AI_ERRORS),
+        wait=wait_random_exponential(min=1, max=30),
+        stop=stop_after_attempt(5),
+        reraise=True
+    )
+    async def _create_completion(prompt: str, max_tokens: int) -> str:
+        """Send one chat completion, retrying transient failures with jittered exponential backoff"""
+        # Acquired per attempt so backoff sleeps do not hold a concurrency slot
+        async with _OPENAI_SEM:
             completion = await openrouter.chat.completions.create(
                 model="openai/gpt-4o-mini", 
                 messages=[
-                    {"role": "system", "content": "You are an expert educational content creator. You must follow the exact format specified."},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=2000
+                max_tokens=max_tokens
             )
-            
-            response_text = completion.choices[0].message.content
-            logger.info(f"OpenRouter response length: {len(response_text)}")
-            
-            return response_text
-            
-        except Exception as e:
-            logger.error(f"OpenRouter failed: {e}")
-            return None
+        
+        return completion.choices[0].message.content
+
+    @staticmethod
+    async def stream_questions(request: QuestionRequest) -> AsyncIterator[dict]:
+        """
+        Stream the AI response for one request and yield each parsed question dict
+        as soon as its "---" separator arrives, instead of waiting for the whole completion.
+        """
+        if not openrouter:
+            raise Exception("AI service not configured - OpenAI API key missing")
+        
+        prompt = AIService._create_ai_prompt(request)
+        seen_hashes = set()
+        buffer = ""
+        
+        def parse(block: str) -> Optional[dict]:
+            block = block.strip()
+            if len(block) < 30:
+                return None
+            question = AIService._parse_single_question(block, request.question_type, request)
+            if not question:
+                return None
+            question_hash = hash_question_text(question['question_text'])
+            if question_hash in seen_hashes:
+                return None
+            seen_hashes.add(question_hash)
+            return question
+        
+        # _open_stream takes a slot that is held for the whole stream, since that is how long the upstream request stays open
+        stream = await AIService._open_stream(prompt, max_tokens=min(16000, max(2000, 400 * request.num_questions)))
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                buffer += chunk.choices[0].delta.content or ""
+                # Everything before the last separator is complete; keep the tail for the next chunk
+                *blocks, buffer = _BLOCK_RE.split(buffer)
+                for block in blocks:
+                    question = parse(block)
+                    if question:
+                        yield question
+        finally:
+            _OPENAI_SEM.release()
+        
+        question = parse(buffer)
+        if question:
+            yield question
+
+    @staticmethod
+    @retry(
+        retry=retry_if_exception_type(_RETRYABLE_AI_ERRORS),
+        wait=wait_random_exponential(min=1, max=30),
+        stop=stop_after_attempt(5),
+        reraise=True
+    )
+    async def _open_stream(prompt: str, max_tokens: int):
+        """
+        Start a streamed chat completion, retrying transient failures.
+        Returns holding an _OPENAI_SEM slot that the caller releases once it has read the stream;
+        a failed attempt releases it, so backoff sleeps do not hold a slot.
+        """
+        await _OPENAI_SEM.acquire()
+        try:
+            return await openrouter.chat.completions.create(
+                model="openai/gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=max_tokens,
+                stream=True
+            )
+        except BaseException:
+            _OPENAI_SEM.release()
+            raise
 
     @staticmethod
     def _create_ai_prompt(request: QuestionRequest) -> str:
@@ -245,14 +807,72 @@ class AIService:
         subject_name = request.subject.value.replace("_", " ").title()
         topic_text = f" about {request.topic}" if request.topic else ""
         
-        prompt = f"""Create {request.num_questions} {request.difficulty.value} level {request.question_type.value.replace('_', ' ')} questions for {subject_name}{topic_text}.
+        return AIService._template_for(request.question_type).format(
+            num_questions=request.num_questions,
+            difficulty=request.difficulty.value,
+            subject=subject_name,
+            topic=topic_text
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def _template_for(question_type: QuestionType) -> str:
+        """Prompt template for one question type; {num_questions}, {difficulty}, {subject} and {topic} are filled per request"""
+        
+        example = AIService._format_example(question_type).replace("{", "{{").replace("}", "}}")
+        return f"""Create {{num_questions}} {{difficulty}} level {_QUESTION_TYPE_NAMES[question_type]} questions for {{subject}}{{topic}}.
+
+CRITICAL: Use this EXACT format for each question:
+
+{example}
+Generate exactly {{num_questions}} questions using this EXACT format.
+- Use TOPIC, SUBTOPIC, QUESTION, ANSWER/BLANKS/PAIRS, EXPLANATION, RATING
+- Separate each question with "---"
+- No extra text or formatting
+- Make questions educational and accurate
+"""
+
+    @staticmethod
+    def _create_batched_ai_prompt(requests: List[QuestionRequest]) -> str:
+        """Create one prompt covering several tasks that share question type and difficulty"""
+        
+        first = requests[0]
+        task_lines = []
+        for task_number, request in enumerate(requests, 1):
+            subject_name = request.subject.value.replace("_", " ").title()
+            # Quoted so a topic reads as data, not as instructions to the tasks around it
+            topic_text = f' about "{request.topic}"' if request.topic else ""
+            task_lines.append(f"TASK {task_number}: {request.num_questions} questions for {subject_name}{topic_text}")
+        tasks_text = "\n".join(task_lines)
+        
+        prompt = f"""Here are {len(requests)} tasks. For each task, create {first.difficulty.value} level {_QUESTION_TYPE_NAMES[first.question_type]} questions.
+
+{tasks_text}
 
 CRITICAL: Use this EXACT format for each question:
 
 """
 
-        if request.question_type == QuestionType.MULTIPLE_CHOICE:
-            prompt += """TOPIC: Electric Current
+        prompt += AIService._format_example(first.question_type)
+        
+        prompt += f"""
+Answer every task, in order.
+- Start each task with a line containing only "TASK <number>:"
+- Generate exactly the requested number of questions for each task using this EXACT format
+- Use TOPIC, SUBTOPIC, QUESTION, ANSWER/BLANKS/PAIRS, EXPLANATION, RATING
+- Separate each question with "---"
+- No extra text or formatting
+- Make questions educational and accurate
+"""
+        
+        return prompt
+
+    @staticmethod
+    def _format_example(question_type: QuestionType) -> str:
+        """Example question block showing the AI the exact output format for a question type"""
+        
+        if question_type == QuestionType.MULTIPLE_CHOICE:
+            return """TOPIC: Electric Current
 SUBTOPIC: SI Units
 QUESTION: What is the fundamental unit of electric current?
 A) Volt
@@ -267,8 +887,8 @@ RATING: 1100
 
 """
         
-        elif request.question_type == QuestionType.TRUE_FALSE:
-            prompt += """TOPIC: Energy Conservation
+        elif question_type == QuestionType.TRUE_FALSE:
+            return """TOPIC: Energy Conservation
 SUBTOPIC: Physics Laws
 QUESTION: Energy can be created and destroyed according to physics laws.
 ANSWER: False
@@ -279,8 +899,8 @@ RATING: 1250
 
 """
         
-        elif request.question_type == QuestionType.FILL_IN_THE_BLANKS:
-            prompt += """TOPIC: Speed of Light
+        elif question_type == QuestionType.FILL_IN_THE_BLANKS:
+            return """TOPIC: Speed of Light
 SUBTOPIC: Physical Constants
 QUESTION: The speed of light in vacuum is _____ meters per second.
 BLANKS: 3×10⁸
@@ -292,7 +912,7 @@ RATING: 1350
 """
         
         else: 
-            prompt += """TOPIC: Chemical Elements
+            return """TOPIC: Chemical Elements
 SUBTOPIC: Periodic Table
 QUESTION: Match the following chemical elements with their symbols:
 PAIRS: Hydrogen=H, Oxygen=O, Carbon=C, Nitrogen=N
@@ -302,44 +922,38 @@ RATING: 1200
 ---
 
 """
-        
-        prompt += f"""
-Generate exactly {request.num_questions} questions using this EXACT format.
-- Use TOPIC, SUBTOPIC, QUESTION, ANSWER/BLANKS/PAIRS, EXPLANATION, RATING
-- Separate each question with "---"
-- No extra text or formatting
-- Make questions educational and accurate
-"""
-        
-        return prompt
 
     @staticmethod
     def _parse_ai_response(ai_response: str, request: QuestionRequest) -> List[dict]:
         """Parse AI response with improved parsing logic"""
         
-        logger.info(f"Parsing AI response of length {len(ai_response)}")
+        logger.info("Parsing AI response of length %d", len(ai_response))
         
         questions = []
-        question_blocks = ai_response.split("---")
-        logger.info(f"Found {len(question_blocks)} potential question blocks")
+        question_blocks = _BLOCK_RE.split(ai_response)
+        logger.debug("Found %d potential question blocks", len(question_blocks))
         
         for i, block in enumerate(question_blocks):
+            # Stripping only shortens a block, so anything already under 30 chars is rejected without a copy
+            if len(block) < 30:
+                logger.debug("Skipping block %d: too short (%d chars)", i + 1, len(block))
+                continue
             block = block.strip()
-            if not block or len(block) < 30:
-                logger.debug(f"Skipping block {i+1}: too short ({len(block)} chars)")
+            if len(block) < 30:
+                logger.debug("Skipping block %d: too short (%d chars)", i + 1, len(block))
                 continue
             
-            logger.info(f"Parsing block {i+1}...")
-            logger.debug(f"Block content: {block[:200]}...")
+            logger.debug("Parsing block %d...", i + 1)
+            logger.debug("Block content: %.200s...", block)
             
             question = AIService._parse_single_question(block, request.question_type, request)
             if question:
                 questions.append(question)
-                logger.info(f"Successfully parsed question {len(questions)}")
+                logger.debug("Successfully parsed question %d", len(questions))
             else:
-                logger.warning(f"Failed to parse block {i+1}")
+                logger.warning("Failed to parse block %d", i + 1)
         
-        logger.info(f"Total questions parsed: {len(questions)}")
+        logger.info("Total questions parsed: %d", len(questions))
         return questions
 
     @staticmethod
@@ -348,85 +962,70 @@ Generate exactly {request.num_questions} questions using this EXACT format.
         
         lines = [line.strip() for line in block.split('\n') if line.strip()]
         
-        # Initialize all fields
-        topic = ""
-        sub_topic = None
-        question_text = ""
+        # Last value per tag wins, except PAIRS, which the AI may spread over several lines;
+        # MC options are kept in order, without their "A) " labels
+        fields = {}
+        pairs_values = []
         options = []
+        for line in lines:
+            match = _LINE_RE.match(line)
+            if match:
+                tag, value = match.group(1).upper(), match.group(2).strip()
+                fields[tag] = value
+                if tag == "PAIRS":
+                    pairs_values.append(value)
+            elif question_type == QuestionType.MULTIPLE_CHOICE:
+                option = _OPT_RE.match(line)
+                if option:
+                    options.append(option.group(2))
+        
+        topic = fields.get("TOPIC", "")
+        sub_topic = fields.get("SUBTOPIC")
+        question_text = fields.get("QUESTION", "")
+        explanation = fields.get("EXPLANATION", "")
+        try:
+            elo_rating = int(fields.get("RATING", 1200))
+        except ValueError:
+            elo_rating = 1200
+        
+        # Question type specific parsing
         correct_answer = ""
-        explanation = ""
         blanks = []
         match_pairs = {}
-        elo_rating = 1200 
+        if question_type in (QuestionType.MULTIPLE_CHOICE, QuestionType.TRUE_FALSE):
+            correct_answer = fields.get("ANSWER", "")
         
-        for line in lines:
-            line_upper = line.upper()
-
-            def get_value(text):
-                parts = text.split(":", 1)
-                return parts[1].strip() if len(parts) > 1 else ""
-            
-            # More flexible parsing - check for various formats
-            if line_upper.startswith("TOPIC:") or line_upper.startswith("Topic:"):
-                topic = get_value(line)
-            elif line_upper.startswith("SUBTOPIC:") or line_upper.startswith("Sub-topic:") or line_upper.startswith("SUBTOPIC:"):
-                sub_topic = get_value(line)
-            elif line_upper.startswith("QUESTION:") or line_upper.startswith("Question:"):
-                question_text = get_value(line)
-            elif line_upper.startswith("EXPLANATION:") or line_upper.startswith("Explanation:"):
-                explanation = get_value(line)
-            elif line_upper.startswith("RATING:") or line_upper.startswith("ELO Rating:"):
-                try:
-                    elo_rating = int(get_value(line))
-                except ValueError:
-                    elo_rating = 1200
-            
-            # Question type specific parsing
-            elif question_type == QuestionType.MULTIPLE_CHOICE:
-                if line.startswith(("A)", "B)", "C)", "D)")):
-                    options.append(line)
-                elif line_upper.startswith("ANSWER:") or line_upper.startswith("Correct Answer:"):
-                    correct_answer = line.split(":", 1)[1].strip()
-            
-            elif question_type == QuestionType.TRUE_FALSE:
-                if line_upper.startswith("ANSWER:") or line_upper.startswith("Answer:"):
-                    correct_answer = line.split(":", 1)[1].strip()
-            
-            elif question_type == QuestionType.FILL_IN_THE_BLANKS:
-                if line_upper.startswith("BLANKS:") or line_upper.startswith("Blanks:"):
-                    blanks_text = line.split(":", 1)[1].strip()
-                    blanks = [item.strip() for item in blanks_text.split(",")]
-                    correct_answer = blanks_text
-            
-            elif question_type == QuestionType.MATCH_THE_FOLLOWING:
-                if line_upper.startswith("PAIRS:") or line_upper.startswith("Match Pairs:"):
-                    pairs_text = line.split(":", 1)[1].strip()
-                    pairs = [pair.strip() for pair in pairs_text.split(",")]
-                    for pair in pairs:
-                        if "=" in pair:
-                            key, value = pair.split("=", 1)
-                            match_pairs[key.strip()] = value.strip()
-                    correct_answer = pairs_text
+        elif question_type == QuestionType.FILL_IN_THE_BLANKS and "BLANKS" in fields:
+            correct_answer = fields["BLANKS"]
+            blanks = [item.strip() for item in correct_answer.split(",")]
+        
+        elif question_type == QuestionType.MATCH_THE_FOLLOWING and pairs_values:
+            correct_answer = pairs_values[-1]
+            for pairs_text in pairs_values:
+                for pair in pairs_text.split(","):
+                    if "=" in pair:
+                        key, value = pair.split("=", 1)
+                        match_pairs[key.strip()] = value.strip()
         
         # Validation with detailed logging
         if not question_text:
-            logger.warning(f"No question text found. Available lines: {[l[:50] for l in lines]}")
+            logger.warning("No question text found. Available lines: %s", [l[:50] for l in lines])
             return None
         
         if not correct_answer:
-            logger.warning(f"No correct answer found for question: {question_text[:50]}...")
+            logger.warning("No correct answer found for question: %.50s...", question_text)
             return None
         
         if question_type == QuestionType.MULTIPLE_CHOICE and len(options) < 4:
-            logger.warning(f"Multiple choice question missing options: found {len(options)}")
+            logger.warning("Multiple choice question missing options: found %d", len(options))
             return None
         
         if question_type == QuestionType.FILL_IN_THE_BLANKS and not blanks:
-            logger.warning(f"Fill in blanks question missing blanks")
+            logger.warning("Fill in blanks question missing blanks")
             return None
         
         if question_type == QuestionType.MATCH_THE_FOLLOWING and len(match_pairs) < 3:
-            logger.warning(f"Match question missing pairs: found {len(match_pairs)}")
+            logger.warning("Match question missing pairs: found %d", len(match_pairs))
             return None
         
         if not topic:
@@ -451,4 +1050,69 @@ Generate exactly {request.num_questions} questions using this EXACT format.
             'elo_rating': elo_rating,
             'elo_range': elo_range,
             'state': request.state
-        }
\ No newline at end of file
+        }
+
+class AIRequestBatcher:
+    """
+    Collects generation requests that arrive within a short window and sends them
+    to the AI together, so concurrent users share one call per question type and difficulty.
+    """
+    
+    def __init__(self, max_batch_size: int = 10, max_wait_seconds: float = 0.05):
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: List[Tuple[QuestionRequest, asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._dispatch_tasks: set = set()
+    
+    async def submit(self, request: QuestionRequest) -> List[dict]:
+        """Queue a request for the next batch and wait for its questions"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((request, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.max_wait_seconds, self._flush)
+        
+        return await future
+    
+    def _flush(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        
+        task = asyncio.create_task(self._dispatch(batch))
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[QuestionRequest, asyncio.Future]]) -> None:
+        logger.info("Dispatching AI batch of %d requests", len(batch))
+        try:
+            if len(batch) == 1:
+                results = [await AIService.generate_questions_with_ai(batch[0][0])]
+            else:
+                results = await AIService.generate_questions_batched([request for request, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), questions in zip(batch, results):
+            if future.done():
+                continue
+            if questions:
+                future.set_result(questions)
+            else:
+                future.set_exception(Exception("Failed to parse AI response into valid questions"))
+
+ai_batcher = AIRequestBatcher(
+    max_batch_size=int(os.getenv("AI_BATCH_MAX_SIZE", "10")),
+    max_wait_seconds=int(os.getenv("AI_BATCH_WINDOW_MS", "50")) / 1000
+)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import services
+import utils
+from models import Base
+from schemas import QuestionRequest
+from services import QuestionService
+
+TRUE_FALSE_QUESTION = {
+    'topic': 'Energy Conservation',
+    'question_text': 'Energy can be created and destroyed.',
+    'explanation': 'Energy is conserved.',
+    'elo_rating': 1250,
+    'elo_range': (1050, 1450),
+    'correct_answer': 'False'
+}
+
+@pytest.fixture
+def session_factory():
+    """Fresh in-memory database per test; StaticPool keeps every session on the same connection"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    services._question_details_cache.clear()
+    services._question_list_cache.clear()
+    utils._dup_cache.clear()
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+@pytest.fixture
+def loaded_questions(monkeypatch):
+    """Capture the ORM objects the read paths hand to _convert_db_to_response"""
+    captured = []
+    convert = QuestionService._convert_db_to_response
+
+    def capture(question):
+        captured.append(question)
+        return convert(question)
+
+    monkeypatch.setattr(QuestionService, "_convert_db_to_response", staticmethod(capture))
+    return captured
+
+async def save_true_false_question(session_factory) -> int:
+    request = QuestionRequest(subject="physics", question_type="true_false", num_questions=1)
+    async with session_factory() as db:
+        question_ids = await QuestionService.save_questions_batch([TRUE_FALSE_QUESTION], request, db)
+    return question_ids[0]
+
+def test_get_question_with_details_raises_on_unlisted_relationship(session_factory, loaded_questions):
+    async def scenario():
+        question_id = await save_true_false_question(session_factory)
+        async with session_factory() as db:
+            response = await QuestionService.get_question_with_details(db, question_id)
+
+        assert response.true_false_data.correct_answer == "False"
+        question = loaded_questions[0]
+        # Listed eager loads are available without IO...
+        assert question.true_false.correct_answer == "False"
+        # ...anything else raises instead of lazy loading
+        with pytest.raises(InvalidRequestError):
+            question.true_false.question
+
+    asyncio.run(scenario())
+
+def test_get_questions_from_db_raises_on_other_type_relationships(session_factory, loaded_questions):
+    async def scenario():
+        await save_true_false_question(session_factory)
+        async with session_factory() as db:
+            responses = await QuestionService.get_questions_from_db(db, question_type="true_false")
+
+        assert [r.true_false_data.correct_answer for r in responses] == ["False"]
+        question = loaded_questions[0]
+        # Filtering by type only JOINs that type's table
+        with pytest.raises(InvalidRequestError):
+            question.multiple_choice
+
+    asyncio.run(scenario())
@@ -1,13 +1,30 @@
-from sqlalchemy import and_, func
+import hashlib
 import logging
-from sqlalchemy.orm import Session
+from typing import Iterable, List, Set
+from cachetools import TTLCache
+from sqlalchemy import bindparam, lambda_stmt, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Question
-from schemas import (
-    QuestionRequest, QuestionResponse, QuestionType,
-    MultipleChoiceData, TrueFalseData, FillInBlanksData, MatchFollowingData
-)
+from schemas import QuestionRequest, QuestionResponse, QuestionType, FrontendQuestion
 logger = logging.getLogger(__name__)
 
+# (subject, question_type, question_text_hash) -> whether that question is already stored.
+# Per-process only: another worker's insert is seen here once a cached False expires.
+_dup_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
+# Built once with named bind parameters so SQLAlchemy reuses the compiled SQL on every call
+_DUP_STMT = lambda_stmt(lambda: select(Question.id).where(
+    Question.question_text_hash == bindparam("question_hash"),
+    Question.subject == bindparam("subject"),
+    Question.question_type == bindparam("question_type")
+).limit(1))
+
+_EXISTING_HASHES_STMT = lambda_stmt(lambda: select(Question.question_text_hash).where(
+    Question.subject == bindparam("subject"),
+    Question.question_type == bindparam("question_type"),
+    Question.question_text_hash.in_(bindparam("question_hashes", expanding=True))
+))
+
 def demonstrate_elo_changes( user_rating, user_attempts, question_rating, question_attempts, is_correct):
     """
     Show how question rating changes based on different user responses
@@ -30,7 +47,7 @@ def demonstrate_elo_changes( user_rating, user_attempts, question_rating, questi
 
 def calculate_rating_change_example(question_rating, question_attempts, 
                                   user_rating, user_attempts, is_correct):
-    """Calculate rating changes for example scenarios"""
+    """Calculate rating changes for example scenarios (use elo.calculate_rating_change_batch for many answers)"""
     
     user_expected = 1 / (1 + 10 ** ((question_rating - user_rating) / 400))
     question_expected = 1 - user_expected
@@ -69,139 +86,194 @@ def get_k_factor_example(rating, attempts_count):
     else:
         return 32
 
-"""
-user rating,
-
-user_attempts
-= Total number of questions this USER has answered across the entire platform,
-
-question_rating,
-
-question_attempts
-= Total number of users who have attempted this specific QUESTION,
-"""
-scenarios = [
-    
-        (800, 10, 1000, 0 ,True),
-        (800, 10, 1000, 5, False),
-        (1000, 15, 1000, 0, True), 
-        (1000, 15, 1000, 0, False,),
-        (1200, 20, 1000, 0,True,),
-        (1200, 20, 1000, 0,False,),
-        (1500, 25, 1000, 0,True,),
-        (1500, 25, 1000, 0,False),
-        (600, 2, 1000, 0,True,),
-        (600, 2, 1000, 0,False),
-    ]
-
-for user_rating, user_attempts, question_rating, question_attempts, is_correct in scenarios:
-    demonstrate_elo_changes(
-        user_rating,
-        user_attempts,
-        question_rating,
-        question_attempts,
-        is_correct
-    )
-
+def hash_question_text(question_text: str) -> str:
+    """Hash the normalized (lowercased, stripped) question text for duplicate lookups"""
+    return hashlib.sha256(question_text.lower().strip().encode()).hexdigest()
 
-def check_duplicate_question(db: Session, question_text: str, subject: str, question_type: str) -> bool:
+async def check_duplicate_question(db: AsyncSession, question_text: str, subject: str, question_type: str) -> bool:
     """Check if a question already exists in the database"""
-    existing = db.query(Question).filter(
-        and_(
-            func.lower(Question.question_text) == question_text.lower().strip(),
-            Question.subject == subject,
-            Question.question_type == question_type
-        )
-    ).first()
+    question_hash = hash_question_text(question_text)
+    key = (subject, question_type, question_hash)
+    cached = _dup_cache.get(key)
+    if cached is not None:
+        return cached
     
+    existing = await db.scalar(
+        _DUP_STMT,
+        {"question_hash": question_hash, "subject": subject, "question_type": question_type}
+    )
+    
+    _dup_cache[key] = existing is not None
     return existing is not None
 
-def convert_to_frontend_format(question_response: QuestionResponse) -> dict:
-    """Convert normalized format to frontend-compatible format"""
+async def find_existing_question_hashes(db: AsyncSession, question_hashes: List[str], subject: str, question_type: str) -> Set[str]:
+    """Return the subset of question_hashes already stored for this subject and question type"""
+    existing = set()
+    misses = []
+    for question_hash in question_hashes:
+        cached = _dup_cache.get((subject, question_type, question_hash))
+        if cached is None:
+            misses.append(question_hash)
+        elif cached:
+            existing.add(question_hash)
     
-    logger.info(f"Converting question: {question_response.question_text[:50]}...")
-    
-    result = {
-        "id": question_response.id,
-        "topic": question_response.topic,
-        "sub_topic": question_response.sub_topic,
-        "question": question_response.question_text,
-        "explanation": question_response.explanation,
-        "elo_rating": question_response.elo_rating,
-        "elo_range": [question_response.elo_min, question_response.elo_max],
-        "state": question_response.state,
-        "options": None,
-        "correct_answer": "",
-        "blanks": None,
-        "match_pairs": None
-    }
+    if not misses:
+        return existing
     
-    if question_response.multiple_choice_data:
-        mc = question_response.multiple_choice_data
-        result["options"] = [
-            f"A) {mc.option_a}",
-            f"B) {mc.option_b}",
-            f"C) {mc.option_c}",
-            f"D) {mc.option_d}"
-        ]
-        result["correct_answer"] = mc.correct_option
+    found = set((await db.scalars(
+        _EXISTING_HASHES_STMT,
+        {"subject": subject, "question_type": question_type, "question_hashes": misses}
+    )).all())
     
-    elif question_response.true_false_data:
-        result["correct_answer"] = question_response.true_false_data.correct_answer
+    for question_hash in misses:
+        _dup_cache[(subject, question_type, question_hash)] = question_hash in found
+    
+    return existing | found
+
+def mark_questions_saved(subject: str, question_type: str, question_hashes: Iterable[str]) -> None:
+    """Record freshly inserted questions so later duplicate checks skip the database"""
+    for question_hash in question_hashes:
+        _dup_cache[(subject, question_type, question_hash)] = True
+
+def forget_question(subject: str, question_type: str, question_hash: str) -> None:
+    """Drop a deleted question from the duplicate cache"""
+    _dup_cache.pop((subject, question_type, question_hash), None)
+
+# Labels the frontend expects in front of the four multiple choice options
+_MC_PREFIXES = ("A) ", "B) ", "C) ", "D) ")
+
+def _multiple_choice_frontend_fields(question_response: QuestionResponse) -> dict:
+    mc = question_response.multiple_choice_data
+    if not mc:
+        return {}
+    return {
+        "options": [prefix + option for prefix, option in zip(_MC_PREFIXES, (mc.option_a, mc.option_b, mc.option_c, mc.option_d))],
+        "correct_answer": mc.correct_option
+    }
+
+def _true_false_frontend_fields(question_response: QuestionResponse) -> dict:
+    tf = question_response.true_false_data
+    if not tf:
+        return {}
+    return {"correct_answer": tf.correct_answer}
+
+def _fill_in_blanks_frontend_fields(question_response: QuestionResponse) -> dict:
+    fib = question_response.fill_in_blanks_data
+    if not fib:
+        return {}
+    return {
+        "blanks": fib.answers,
+        "correct_answer": ",".join(map(str, fib.answers))
+    }
+
+def _match_following_frontend_fields(question_response: QuestionResponse) -> dict:
+    match = question_response.match_following_data
+    if not match:
+        return {}
+    return {
+        "match_pairs": match.pairs,
+        "correct_answer": ",".join(f"{k}={v}" for k, v in match.pairs.items())
+    }
+
+# question_type -> builder for the type-specific frontend fields; each touches only its own data
+_FRONTEND_FIELD_BUILDERS = {
+    QuestionType.MULTIPLE_CHOICE.value: _multiple_choice_frontend_fields,
+    QuestionType.TRUE_FALSE.value: _true_false_frontend_fields,
+    QuestionType.FILL_IN_THE_BLANKS.value: _fill_in_blanks_frontend_fields,
+    QuestionType.MATCH_THE_FOLLOWING.value: _match_following_frontend_fields,
+}
+
+def convert_to_frontend_format(question_response: QuestionResponse) -> FrontendQuestion:
+    """Convert normalized format to frontend-compatible format"""
     
-    elif question_response.fill_in_blanks_data:
-        answers = question_response.fill_in_blanks_data.answers
-        result["blanks"] = answers
-        result["correct_answer"] = ",".join([str(ans) for ans in answers])
+    logger.debug("Converting question: %.50s...", question_response.question_text)
     
-    elif question_response.match_following_data:
-        pairs = question_response.match_following_data.pairs
-        result["match_pairs"] = pairs
-        result["correct_answer"] = ",".join([f"{str(k)}={str(v)}" for k, v in pairs.items()])
+    build_type_fields = _FRONTEND_FIELD_BUILDERS.get(question_response.question_type)
+    type_fields = build_type_fields(question_response) if build_type_fields else {}
     
-    return result
+    return FrontendQuestion(
+        id=question_response.id,
+        topic=question_response.topic,
+        sub_topic=question_response.sub_topic,
+        question=question_response.question_text,
+        explanation=question_response.explanation,
+        elo_rating=question_response.elo_rating,
+        elo_range=[question_response.elo_min, question_response.elo_max],
+        state=question_response.state,
+        **type_fields
+    )
 
-def create_question_response_from_dict(question_data: dict, request: QuestionRequest, question_id: int) -> QuestionResponse:
+def build_frontend_question(question_data: dict, request: QuestionRequest, question_id: int) -> FrontendQuestion:
     """
-    Create a QuestionResponse object from AI-generated question data
+    Build the frontend question directly from AI-generated question data
     """
-    response = QuestionResponse(
-        id=question_id,
-        subject=request.subject.value,
-        difficulty=request.difficulty.value,
-        question_type=request.question_type.value,
-        topic=question_data['topic'],
-        sub_topic=question_data.get('sub_topic'),
-        question_text=question_data['question_text'],
-        explanation=question_data.get('explanation'),
-        elo_rating=question_data['elo_rating'],
-        elo_min=question_data['elo_range'][0],
-        elo_max=question_data['elo_range'][1],
-        state=question_data['state'].value if hasattr(question_data['state'], 'value') else question_data['state']
-    )
+    options = None
+    correct_answer = ""
+    blanks = None
+    match_pairs = None
     
     if request.question_type == QuestionType.MULTIPLE_CHOICE and question_data.get('options'):
-        response.multiple_choice_data = MultipleChoiceData(
-            option_a=question_data['options'][0][3:],  
-            option_b=question_data['options'][1][3:],  
-            option_c=question_data['options'][2][3:],  
-            option_d=question_data['options'][3][3:],  
-            correct_option=question_data['correct_answer']
-        )
+        options = [prefix + option for prefix, option in zip(_MC_PREFIXES, question_data['options'])]
+        correct_answer = question_data['correct_answer']
     
     elif request.question_type == QuestionType.TRUE_FALSE:
-        response.true_false_data = TrueFalseData(
-            correct_answer=question_data['correct_answer']
-        )
+        correct_answer = question_data['correct_answer']
     
     elif request.question_type == QuestionType.FILL_IN_THE_BLANKS and question_data.get('blanks'):
-        response.fill_in_blanks_data = FillInBlanksData(
-            answers=question_data['blanks']
-        )
+        blanks = question_data['blanks']
+        correct_answer = ",".join(map(str, blanks))
     
     elif request.question_type == QuestionType.MATCH_THE_FOLLOWING and question_data.get('match_pairs'):
-        response.match_following_data = MatchFollowingData(
-            pairs=question_data['match_pairs']
-        )
+        match_pairs = question_data['match_pairs']
+        correct_answer = ",".join(f"{k}={v}" for k, v in match_pairs.items())
     
-    return response
+    return FrontendQuestion(
+        id=question_id,
+        topic=question_data['topic'],
+        sub_topic=question_data.get('sub_topic'),
+        question=question_data['question_text'],
+        explanation=question_data.get('explanation'),
+        elo_rating=question_data['elo_rating'],
+        elo_range=list(question_data['elo_range']),
+        state=question_data['state'].value if hasattr(question_data['state'], 'value') else question_data['state'],
+        options=options,
+        correct_answer=correct_answer,
+        blanks=blanks,
+        match_pairs=match_pairs
+    )
+
+
+if __name__ == "__main__":
+    """
+    user rating,
+
+    user_attempts
+    = Total number of questions this USER has answered across the entire platform,
+
+    question_rating,
+
+    question_attempts
+    = Total number of users who have attempted this specific QUESTION,
+    """
+    scenarios = [
+
+            (800, 10, 1000, 0 ,True),
+            (800, 10, 1000, 5, False),
+            (1000, 15, 1000, 0, True), 
+            (1000, 15, 1000, 0, False,),
+            (1200, 20, 1000, 0,True,),
+            (1200, 20, 1000, 0,False,),
+            (1500, 25, 1000, 0,True,),
+            (1500, 25, 1000, 0,False),
+            (600, 2, 1000, 0,True,),
+            (600, 2, 1000, 0,False),
+        ]
+
+    for user_rating, user_attempts, question_rating, question_attempts, is_correct in scenarios:
+        demonstrate_elo_changes(
+            user_rating,
+            user_attempts,
+            question_rating,
+            question_attempts,
+            is_correct
+        )